@@ -1,17 +1,79 @@
+import numpy as np
 import pandas as pd
 import joblib
-import pickle
+import logging
 import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated
 
 
-# Load the ML model
-model = joblib.load("../../../../models/model.pkl")
+# Column order the pipeline was fitted on (model.feature_names_in_)
+FEATURE_COLUMNS = [
+    "Manufacturer", "Model", "Engine size", "Fuel type", "Year of manufacture",
+    "Mileage", "age", "mileage_per_year", "vintage",
+]
 
-# Create an API app
-app = FastAPI(title="Car price prediction API", version="1.0")
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ML model; loaded in lifespan() at startup rather than at import time
+MODEL_PATH = "../../../../models/model.pkl"
+model = None
+
+# Blocking inference runs here so the event loop stays free; created and shut down in lifespan()
+_EXECUTOR = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global model, _EXECUTOR
+    # Numpy arrays in the pickle are memory-mapped read-only, so workers share their pages
+    model = joblib.load(MODEL_PATH, mmap_mode="r")
+
+    # Rows are built positionally below, so fail fast if the model disagrees
+    if list(getattr(model, "feature_names_in_", FEATURE_COLUMNS)) != FEATURE_COLUMNS:
+        raise RuntimeError(f"model.pkl expects columns {list(model.feature_names_in_)}")
+    _predict_cached.cache_clear()
+
+    _EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+    # Score a real row twice on the executor so the first request doesn't pay for lazy allocation
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    for _ in range(2):
+        await loop.run_in_executor(_EXECUTOR, _predict_cached.__wrapped__, *WARMUP_CAR)
+    logger.info("Model warm-up took %.1f ms", (time.perf_counter() - start) * 1000)
+    yield
+    _EXECUTOR.shutdown(wait=False)
+
+# Reference year for the derived age features, fixed at the year the model was trained
+CURRENT_YEAR = 2025
+
+# Newest accepted year of manufacture, from the UTC clock at startup
+MAX_YEAR = time.gmtime().tm_year
+
+# Request body for /predict; JSON keys match the training column names
+class CarFeatures(BaseModel):
+    Manufacturer: str
+    Model: str
+    Fuel_type: Annotated[str, Field(alias="Fuel type")]
+    Engine_size: Annotated[float, Field(alias="Engine size", gt=0)]
+    Year_of_manufacture: Annotated[int, Field(alias="Year of manufacture", ge=1980, le=MAX_YEAR)]
+    Mileage: Annotated[float, Field(ge=0)]
+
+    # Strip once during validation; bad or out-of-range input is a 422 before the handler runs
+    model_config = ConfigDict(str_strip_whitespace=True, str_to_lower=False)
+
+# Create an API app; orjson renders responses in C instead of the stdlib json module
+app = FastAPI(title="Car price prediction API", version="1.0", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 # API launching test endpoint
 @app.get("/health")
@@ -29,38 +91,39 @@ def model_metadata():
             "year_of_manufacture", "mileage"]
     }
 
-# Define prediction endpoint
-@app.post("/predict")
-def predict_car_price(payload: dict):
-    manufacturer = str(payload["Manufacturer"]).strip()
-    model_name = str(payload["Model"]).strip()
-    fuel = str(payload["Fuel type"]).strip()
-    engine = float(payload["Engine size"])
-    year = int(payload["Year of manufacture"])
-    mileage = float(payload["Mileage"])
+# Canonical car scored at startup: (manufacturer, model, fuel, engine, year, mileage)
+WARMUP_CAR = ("Toyota", "Corolla", "Petrol", 1.8, 2018, 50000.0)
 
+@lru_cache(maxsize=4096)
+def _predict_cached(manufacturer: str, model_name: str, fuel: str, engine: float,
+                    year: int, mileage: float) -> float:
     # Derived features for training pipelines
-    CURRENT_YEAR = 2025
     age = max(CURRENT_YEAR - year, 0)
     mileage_per_year = mileage / max(age, 1)
     vintage = int(age >= 20)
 
-    # Combine all columns needed in a single-row dataframe
-    row = {
-        "Manufacturer": manufacturer,
-        "Model": model_name,
-        "Fuel type": fuel,
-        "Engine size": engine,
-        "Year of manufacture": year,
-        "Mileage": mileage,
-        "age": age,
-        "mileage_per_year": mileage_per_year,
-        "vintage": vintage,
-    }    
-    df = pd.DataFrame([row]) # Create the dataframe
-    prediction = model.predict(df)[0]
-
-    return {"predicted_price": round(float(prediction), 2)}
+    # Single object row in FEATURE_COLUMNS order, wrapped without copying
+    row = np.array([(manufacturer, model_name, engine, fuel, year, mileage,
+                     age, mileage_per_year, vintage)], dtype=object)
+    df = pd.DataFrame(row, columns=FEATURE_COLUMNS, copy=False)
+    return float(model.predict(df)[0])
+
+# Define prediction endpoint
+@app.post("/predict")
+async def predict_car_price(payload: CarFeatures):
+    manufacturer = payload.Manufacturer
+    model_name = payload.Model
+    fuel = payload.Fuel_type
+    engine = payload.Engine_size
+    year = payload.Year_of_manufacture
+    mileage = payload.Mileage
+
+    loop = asyncio.get_running_loop()
+    prediction = await loop.run_in_executor(
+        _EXECUTOR, _predict_cached, manufacturer, model_name, fuel, engine, year, mileage
+    )
+
+    return {"predicted_price": round(prediction, 2)}
 
 # Define the root endpoint
 @app.get("/", response_class=HTMLResponse)
@@ -79,4 +142,5 @@ curl.exe -X POST "http://127.0.0.1:8000/predict" `
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    # Workers need an import string; one process per core
+    uvicorn.run("main:app", host="127.0.0.1", port=8000, workers=os.cpu_count())
\ No newline at end of file
@@ -3,19 +3,37 @@ With this code, the goal is to demonstrate the process of deploying machine lear
 """
 # Import necessary libraries
 import joblib
+import numpy as np
 import pandas as pd
-from typing import Annotated
+from typing import Annotated, List
 from contextlib import asynccontextmanager
-from pydantic import BaseModel, Field, ConfigDict
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 import uvicorn
 import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
 import json
+from functools import lru_cache
+from collections import OrderedDict
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional: the pickled pipeline is served instead
+    ort = None
+
+try:
+    from numba import njit
+except ImportError:  # optional: batch features fall back to plain numpy
+    njit = None
 
 # Define a Pydantic model for the input payload
 class CarFeatures(BaseModel):
@@ -26,12 +44,57 @@ class CarFeatures(BaseModel):
     Year_of_manufacture: Annotated[int, Field(alias="Year of manufacture", ge=1980)]
     Mileage: Annotated[float, Field(ge=0)]
 
-    # Pydantic v2 configuration: allow population by field name when alias exists
-    model_config = ConfigDict(populate_by_name=True)
+    # Pydantic v2 configuration: allow population by field name when alias exists,
+    # and strip surrounding whitespace from strings during validation
+    model_config = ConfigDict(populate_by_name=True, str_strip_whitespace=True)
 
 # Current year for age calculation from system date
 CURRENT_YEAR = datetime.now().year
 
+# Canonical car scored at startup: (manufacturer, model, fuel, engine, year, mileage)
+WARMUP_CAR = ("Toyota", "Corolla", "Petrol", 1.8, 2018, 50000.0)
+
+# Recent /predict results, most recently used last; only touched from the event loop
+PREDICTION_CACHE_SIZE = 4096
+_prediction_cache = OrderedDict()
+
+# Uncached /predict calls are queued and scored together, up to MAX_BATCH rows per model call.
+# When several requests are already waiting, the batch stays open MAX_WAIT_MS for more.
+MAX_BATCH = 64
+MAX_WAIT_MS = 5
+
+# Column order the pipeline was fitted on (model.feature_names_in_)
+FEATURE_COLUMNS = [
+    "Manufacturer", "Model", "Engine size", "Fuel type", "Year of manufacture",
+    "Mileage", "age", "mileage_per_year", "vintage",
+]
+
+# Batch feature engineering: age, mileage_per_year and vintage for many cars at once.
+# mileage_per_year stays float64 so batch rows score exactly like single /predict rows.
+def _derive_numpy(years: np.ndarray, mileages: np.ndarray, current_year: int):
+    age = np.maximum(current_year - years, 0).astype(np.int32)
+    mileage_per_year = mileages / np.maximum(age, 1)
+    vintage = (age >= 20).astype(np.int32)
+    return age, mileage_per_year, vintage
+
+if njit is not None:
+    # Serial on purpose: batches are capped at 1000 rows, where spinning up numba's
+    # thread pool costs more than it saves and contends with XGBoost's OpenMP threads
+    @njit(cache=True)
+    def derive_features(years, mileages, current_year):
+        n = years.shape[0]
+        age = np.empty(n, dtype=np.int32)
+        mileage_per_year = np.empty(n, dtype=np.float64)
+        vintage = np.empty(n, dtype=np.int32)
+        for i in range(n):
+            a = max(current_year - years[i], 0)
+            age[i] = a
+            mileage_per_year[i] = mileages[i] / max(a, 1)
+            vintage[i] = 1 if a >= 20 else 0
+        return age, mileage_per_year, vintage
+else:
+    derive_features = _derive_numpy
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("car-price-api")
@@ -39,6 +102,34 @@ logger = logging.getLogger("car-price-api")
 # Resolve and load model robustly
 model = None
 
+# Compiled model (model.onnx next to model.pkl, see export_onnx.py), if available
+onnx_session = None
+onnx_inputs = []  # (input name, index into FEATURE_COLUMNS, numpy dtype)
+
+# Pipeline preprocessing precomputed for the booster, see build_fast_path()
+fast_path = None  # (estimator, n_features, numeric specs, _CAT_INDEX)
+
+# /features and /metadata never change while a model is loaded, so their JSON is rendered once
+_FEATURES_PAYLOAD = None  # bytes, rendered in lifespan
+_METADATA_PAYLOAD = json.dumps({
+    "model_info": "Car Price Prediction Model",
+    "model": "model.pkl",
+    "version": "1.0.0",
+    "features": [
+        "manufacturer", "model", "engine_size", "fuel_type",
+        "year_of_manufacture", "mileage"
+    ]
+}, separators=(",", ":")).encode("utf-8")
+
+# Thread pool for blocking inference, created in lifespan
+executor = None
+
+# Micro-batching queue of (row key, future) and the task draining it, created in lifespan
+_batch_queue = None
+_batch_worker_task = None
+
+# Resolved once per process; the stat calls and env lookup are not repeated per caller
+@lru_cache(maxsize=1)
 def resolve_model_path() -> Path:
     """Resolve model path: check local first, then env var, then repo root."""
     # Priority 1: Check for model in same directory as this file
@@ -55,41 +146,114 @@ def resolve_model_path() -> Path:
     repo_root = Path(__file__).resolve().parents[4]
     return repo_root / "models" / "model.pkl"
 
+def load_onnx_session(model_path: Path):
+    """Open the ONNX export that sits next to the pickle; (None, []) if there isn't one."""
+    onnx_path = model_path.with_suffix(".onnx")
+    if ort is None or not onnx_path.exists():
+        return None, []
+    session = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"])
+    # skl2onnx names inputs after the columns, with spaces replaced by underscores
+    column_index = {col.replace(" ", "_"): i for i, col in enumerate(FEATURE_COLUMNS)}
+    dtypes = {"tensor(string)": object, "tensor(int64)": np.int64, "tensor(double)": np.float64}
+    inputs = [(i.name, column_index[i.name], dtypes[i.type]) for i in session.get_inputs()]
+    return session, inputs
+
+def build_fast_path(pipeline):
+    """
+    Precompute the ColumnTransformer so rows can be encoded for the booster without pandas.
+
+    Returns None unless the preprocessor is exactly a StandardScaler plus a
+    OneHotEncoder(handle_unknown="ignore") with sparse output, in which case the
+    full pipeline is used. encode_rows marks zeros as missing, which only matches
+    what the booster saw in training when the ColumnTransformer output was sparse.
+    """
+    preprocessor = pipeline.named_steps.get("preprocessor")
+    estimator = pipeline.named_steps.get("model")
+    if preprocessor is None or estimator is None or not hasattr(preprocessor, "output_indices_"):
+        return None
+    if not getattr(preprocessor, "sparse_output_", False):
+        return None
+
+    numeric, cat_index = [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        start = preprocessor.output_indices_[name].start
+        positions = [FEATURE_COLUMNS.index(col) for col in columns]
+        if isinstance(transformer, StandardScaler) and transformer.with_mean and transformer.with_std:
+            numeric += [
+                (pos, start + j, float(transformer.mean_[j]), float(transformer.scale_[j]))
+                for j, pos in enumerate(positions)
+            ]
+        elif isinstance(transformer, OneHotEncoder) and transformer.handle_unknown == "ignore" \
+                and transformer.drop is None and getattr(transformer, "infrequent_categories_", None) is None:
+            for pos, categories in zip(positions, transformer.categories_):
+                cat_index.append((pos, {cat: start + k for k, cat in enumerate(categories.tolist())}))
+                start += len(categories)
+        else:
+            return None
+
+    n_features = max(sl.stop for sl in preprocessor.output_indices_.values())
+    return estimator, n_features, numeric, cat_index
+
+def encode_rows(columns, n_features, numeric, cat_index) -> np.ndarray:
+    """Encode FEATURE_COLUMNS arrays exactly as the preprocessor would for the booster."""
+    n = len(columns[FEATURE_COLUMNS[0]])
+    x = np.zeros((n, n_features))
+    # Scale in float64 like StandardScaler; the tree thresholds sit on these values cast to float32
+    for pos, col, mean, scale in numeric:
+        x[:, col] = (columns[FEATURE_COLUMNS[pos]] - mean) / scale
+    # Unknown categories leave their block all zeros, as handle_unknown="ignore" does
+    for pos, index in cat_index:
+        cols = np.fromiter((index.get(v, -1) for v in columns[FEATURE_COLUMNS[pos]]), dtype=np.intp, count=n)
+        known = np.flatnonzero(cols >= 0)
+        x[known, cols[known]] = 1.0
+    x = x.astype(np.float32)
+    # The booster was fitted on the sparse encoder output, where absent entries are missing, not 0
+    x[x == 0] = np.nan
+    return x
+
+# Cars scored both ways before the fast path is trusted: (manufacturer, model, fuel, engine, year, mileage).
+# The last one has categories the encoder has never seen.
+_PARITY_CARS = [
+    ("Toyota", "Corolla", "Petrol", 1.8, 2018, 50000),
+    ("BMW", "X3", "Diesel", 2.0, 2015, 60000),
+    ("Ford", "Focus", "Diesel", 1.5, 1999, 123000),
+    ("Porsche", "911", "Hybrid", 3.0, 2025, 0),
+    ("Unknown", "Unknown", "Unknown", 1.0, 1980, 300000),
+]
+
+def fast_path_matches(pipeline, fast_path) -> bool:
+    """Score _PARITY_CARS through the fast path and through pipeline.predict; True if they agree."""
+    columns = _feature_columns(_PARITY_CARS)
+    estimator, n_features, numeric, cat_index = fast_path
+    fast = estimator.predict(encode_rows(columns, n_features, numeric, cat_index))
+    full = pipeline.predict(pd.DataFrame(columns, columns=FEATURE_COLUMNS))
+    return bool(np.allclose(fast, full, rtol=1e-6))
+
 def fix_xgboost_compatibility(pipeline):
     """
     Fix compatibility issues with XGBoost models trained on older versions.
-    Wraps XGBoost model's get_params method to handle deprecated/missing parameters.
+    Sets defaults once for deprecated/missing parameters so get_params works unwrapped.
     """
     try:
         if hasattr(pipeline, 'named_steps') and 'model' in pipeline.named_steps:
             xgb_model = pipeline.named_steps['model']
 
-            # Store original get_params method
-            original_get_params = xgb_model.get_params
-
-            # Create wrapper that handles missing attributes
-            def safe_get_params(deep=True):
-                """Wrapper for get_params that sets defaults for missing attributes."""
-                # Common deprecated/missing parameters in older XGBoost versions
-                default_params = {
-                    'gpu_id': -1,
-                    'predictor': 'auto',
-                    'tree_method': 'auto',
-                    'booster': 'gbtree',
-                    'n_jobs': 1,
-                    'verbosity': 0,
-                }
-
-                # Set missing attributes to defaults
-                for param, default_value in default_params.items():
-                    if not hasattr(xgb_model, param):
-                        setattr(xgb_model, param, default_value)
-
-                # Call original method
-                return original_get_params(deep=deep)
-
-            # Replace get_params method
-            xgb_model.get_params = safe_get_params
+            # Common deprecated/missing parameters in older XGBoost versions
+            default_params = {
+                'gpu_id': -1,
+                'predictor': 'auto',
+                'tree_method': 'auto',
+                'booster': 'gbtree',
+                'n_jobs': 1,
+                'verbosity': 0,
+            }
+
+            # Set missing attributes to defaults; they stay on the model, so no per-call wrapper
+            for param, default_value in default_params.items():
+                if not hasattr(xgb_model, param):
+                    setattr(xgb_model, param, default_value)
             logger.info("Applied XGBoost compatibility fix")
 
     except Exception as e:
@@ -100,23 +264,80 @@ def fix_xgboost_compatibility(pipeline):
 async def lifespan(app: FastAPI):
     """Modern lifespan context manager for startup/shutdown events."""
     # Startup: Load model
-    global model
+    global model, onnx_session, onnx_inputs, fast_path, executor, _FEATURES_PAYLOAD
+    global _batch_queue, _batch_worker_task
     model_path = resolve_model_path()
     try:
         model = joblib.load(model_path)
         model = fix_xgboost_compatibility(model)
+        # Rows are built positionally in /predict, so the fitted order must match
+        fitted_columns = list(getattr(model, "feature_names_in_", FEATURE_COLUMNS))
+        if fitted_columns != FEATURE_COLUMNS:
+            raise ValueError(f"model expects columns {fitted_columns}")
+        _prediction_cache.clear()
         logger.info(f"Model loaded from: {model_path}")
     except Exception as e:
         logger.error(f"Failed to load model from {model_path}: {e}")
         model = None
 
+    # Prefer the compiled ONNX graph for inference; the pickle still backs /features
+    fast_path = None
+    if model is not None:
+        try:
+            fast_path = build_fast_path(model)
+            if fast_path is not None and not fast_path_matches(model, fast_path):
+                logger.warning("Precomputed preprocessor disagrees with the pipeline, using the full pipeline")
+                fast_path = None
+        except Exception as e:
+            logger.warning(f"Could not precompute the preprocessor, using the full pipeline: {e}")
+        try:
+            onnx_session, onnx_inputs = load_onnx_session(model_path)
+            if onnx_session is not None:
+                logger.info(f"Serving predictions from {model_path.with_suffix('.onnx')}")
+        except Exception as e:
+            logger.warning(f"Could not load ONNX model, using the pickled pipeline: {e}")
+            onnx_session, onnx_inputs = None, []
+
+    # Compile (or load the cached) batch kernel now rather than on the first request
+    derive_features(np.array([2020], dtype=np.int32), np.array([10000.0]), CURRENT_YEAR)
+
+    # Everything /features reports comes from the model and models_map.json, read once here
+    _FEATURES_PAYLOAD = json.dumps(build_features_payload(), separators=(",", ":")).encode("utf-8")
+
+    # Inference is CPU-bound and mostly runs in C, so give it one thread per core
+    executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+    _batch_queue = asyncio.Queue()
+    _batch_worker_task = asyncio.create_task(_batch_worker())
+
+    # Score a real row twice so the first request doesn't pay for lazy allocation in the model
+    if model is not None:
+        try:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            for _ in range(2):
+                await loop.run_in_executor(executor, _score_rows, [WARMUP_CAR])
+            logger.info(f"Model warm-up took {(time.perf_counter() - start) * 1000:.1f} ms")
+        except Exception as e:
+            logger.warning(f"Model warm-up failed: {e}")
+
     yield  # Application is running
 
     # Shutdown: cleanup if needed
+    _batch_worker_task.cancel()
+    try:
+        await _batch_worker_task
+    except asyncio.CancelledError:
+        pass
+    executor.shutdown(wait=False)
     logger.info("Application shutting down")
 
-# Create FastAPI app with lifespan
-app = FastAPI(title="Car Price Prediction API", version="1.0.0", lifespan=lifespan)
+# Create FastAPI app with lifespan; orjson renders responses in C instead of the stdlib json module
+app = FastAPI(
+    title="Car Price Prediction API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # Add CORS middleware to allow frontend to communicate with backend
 app.add_middleware(
@@ -127,10 +348,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# The frontend never changes while the server runs, so it is read from disk once
+@lru_cache(maxsize=1)
+def _index_html() -> bytes:
+    return (Path(__file__).parent / "index.html").read_bytes()
+
 # Root endpoint - serve the HTML page
-@app.get("/")
+@app.get("/", response_class=HTMLResponse)
 def read_root():
-    return FileResponse(str((Path(__file__).parent / "index.html").resolve()))
+    return HTMLResponse(content=_index_html())
 
 # Health check endpoint
 @app.get("/health")
@@ -142,9 +368,7 @@ def health_check():
 def readiness_check():
     return {"model_loaded": model is not None}
 
-# Get available feature values from the model
-@app.get("/features")
-def get_available_features():
+def build_features_payload() -> dict:
     """Return valid values for each feature; falls back to defaults if unavailable."""
     # Defaults
     engine_sizes = [
@@ -199,29 +423,133 @@ def get_available_features():
         "ModelByManufacturer": model_by_manufacturer,
     }
 
+# Get available feature values from the model
+@app.get("/features")
+def get_available_features():
+    """Return valid values for each feature, as rendered at startup."""
+    if _FEATURES_PAYLOAD is None:  # lifespan has not run (e.g. app mounted without it)
+        return build_features_payload()
+    return Response(content=_FEATURES_PAYLOAD, media_type="application/json")
+
 # Model metadata endpoint
 @app.get("/metadata")
 def get_metadata():
+    return Response(content=_METADATA_PAYLOAD, media_type="application/json")
+
+def _feature_columns(keys) -> dict:
+    """FEATURE_COLUMNS arrays for (manufacturer, model, fuel, engine, year, mileage) rows."""
+    manufacturers, model_names, fuels, engines, years, mileages = zip(*keys)
+    years = np.array(years, dtype=np.int32)
+    mileages = np.array(mileages, dtype=np.float64)
+    # Derived features (training pipeline expected these)
+    age, mileage_per_year, vintage = derive_features(years, mileages, CURRENT_YEAR)
+
+    # ALL columns needed, built as whole arrays
     return {
-        "model_info": "Car Price Prediction Model",
-        "model": "model.pkl",
-        "version": "1.0.0",
-        "features": [
-            "manufacturer", "model", "engine_size", "fuel_type",
-            "year_of_manufacture", "mileage"
-        ]
-    }       
-
-# Prediction endpoint
-@app.post("/predict")
-def predict_car_price(payload: CarFeatures):
+        "Manufacturer": np.array(manufacturers, dtype=object),
+        "Model": np.array(model_names, dtype=object),
+        "Engine size": np.array(engines, dtype=np.float64),
+        "Fuel type": np.array(fuels, dtype=object),
+        "Year of manufacture": years,
+        "Mileage": mileages,
+        # derived:
+        "age": age,
+        "mileage_per_year": mileage_per_year,
+        "vintage": vintage,
+    }
+
+def _score_rows(keys) -> np.ndarray:
+    """Score (manufacturer, model, fuel, engine, year, mileage) rows with one model call."""
+    columns = _feature_columns(keys)
+
+    if onnx_session is not None:
+        feed = {
+            name: columns[FEATURE_COLUMNS[i]].astype(dtype, copy=False).reshape(-1, 1)
+            for name, i, dtype in onnx_inputs
+        }
+        return onnx_session.run(None, feed)[0].ravel()
+
+    if fast_path is not None:
+        estimator, n_features, numeric, cat_index = fast_path
+        return estimator.predict(encode_rows(columns, n_features, numeric, cat_index))
+
+    # Make prediction using the pre-trained model
+    return model.predict(pd.DataFrame(columns, columns=FEATURE_COLUMNS))
+
+def _row_key(car: CarFeatures) -> tuple:
+    """Cache and scoring key for one car: the validated inputs exactly as the model sees them."""
+    return (car.Manufacturer, car.Model, car.Fuel_type, car.Engine_size,
+            car.Year_of_manufacture, car.Mileage)
+
+def _drain_queue(batch: list) -> None:
+    while len(batch) < MAX_BATCH and not _batch_queue.empty():
+        batch.append(_batch_queue.get_nowait())
+
+async def _batch_worker():
+    """Take queued /predict rows in batches and resolve each request's future with its price."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _batch_queue.get()]
+        _drain_queue(batch)
+        # A lone request is scored at once; only concurrent arrivals wait for more company
+        if 1 < len(batch) < MAX_BATCH:
+            await asyncio.sleep(MAX_WAIT_MS / 1000)
+            _drain_queue(batch)
+
+        try:
+            prices = await loop.run_in_executor(executor, _score_rows, [key for key, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), price in zip(batch, prices):
+                if not future.done():
+                    future.set_result(float(price))
+
+# CarFeatures' compiled core validator; /predict feeds it the raw body so JSON is parsed in Rust
+_CAR_VALIDATOR = CarFeatures.__pydantic_validator__
+
+def _body_errors(body: bytes) -> list:
+    """Errors for a body that is not a JSON object, in the shape FastAPI reports them."""
+    try:
+        value = json.loads(body) if body else None
+    except json.JSONDecodeError as e:
+        return [{"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error",
+                 "input": {}, "ctx": {"error": e.msg}}]
+    if value is None:
+        return [{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}]
+    try:
+        CarFeatures.model_validate(value, from_attributes=True)
+    except ValidationError as e:
+        return [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+    return []
+
+# Prediction endpoint; the body schema is declared by hand since the handler reads the request itself
+@app.post("/predict", openapi_extra={"requestBody": {
+    "required": True,
+    "content": {"application/json": {"schema": CarFeatures.model_json_schema()}},
+}})
+async def predict_car_price(request: Request):
     """
     Predict car price based on provided features.
 
     Raises:
+        RequestValidationError: 422 if the body is not a valid CarFeatures
         HTTPException: 503 if model is not loaded
         HTTPException: 500 if prediction fails
     """
+    body = await request.body()
+    try:
+        payload = _CAR_VALIDATOR.validate_json(body)
+    except ValidationError as e:
+        # Same 422 body FastAPI produces for a declared CarFeatures parameter: field errors
+        # sit under ("body", <field>), and a body that isn't an object is re-checked its way
+        errors = e.errors(include_url=False)
+        if any(not err["loc"] for err in errors):
+            raise RequestValidationError(_body_errors(body))
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in errors])
+
     # Check if model is loaded
     if model is None:
         logger.error("Prediction attempted but model is not loaded")
@@ -232,35 +560,22 @@ def predict_car_price(payload: CarFeatures):
 
     try:
         # Pydantic model handles data extraction and validation
-
-        # Derived features (training pipeline expected these)
-        age = max(CURRENT_YEAR - payload.Year_of_manufacture, 0)
-        mileage_per_year = payload.Mileage / max(age, 1)
-        vintage = int(age >= 20)
-
-        # Create single-row dataframe with ALL columns needed
-        # IMPORTANT: Column order MUST match the model's expected feature order
-        row = {
-            "Manufacturer": payload.Manufacturer,
-            "Model": payload.Model,
-            "Engine size": payload.Engine_size,
-            "Fuel type": payload.Fuel_type,
-            "Year of manufacture": payload.Year_of_manufacture,
-            "Mileage": payload.Mileage,
-            # derived:
-            "age": age,
-            "mileage_per_year": mileage_per_year,
-            "vintage": vintage,
-        }
-        row_df = pd.DataFrame([row])
-
-        # Make prediction using the pre-trained model
-        prediction = model.predict(row_df)[0]
+        key = _row_key(payload)
+        prediction = _prediction_cache.get(key)
+        if prediction is None:
+            future = asyncio.get_running_loop().create_future()
+            await _batch_queue.put((key, future))
+            prediction = await future
+            _prediction_cache[key] = prediction
+            if len(_prediction_cache) > PREDICTION_CACHE_SIZE:
+                _prediction_cache.popitem(last=False)
+        else:
+            _prediction_cache.move_to_end(key)
 
         logger.info(f"Prediction successful for {payload.Manufacturer} {payload.Model}: £{prediction:.2f}")
 
         # Return the prediction result
-        return {"predicted_price_gbp": round(float(prediction), 2)}
+        return {"predicted_price_gbp": round(prediction, 2)}
 
     except Exception as e:
         logger.error(f"Prediction failed: {str(e)}", exc_info=True)
@@ -269,6 +584,41 @@ def predict_car_price(payload: CarFeatures):
             detail=f"Prediction failed: {str(e)}"
         )
 
+def _predict_batch(cars: List[CarFeatures]) -> np.ndarray:
+    """Score many cars with one model call, keyed exactly like /predict."""
+    return _score_rows([_row_key(c) for c in cars])
+
+# Batch prediction endpoint
+@app.post("/predict_batch")
+async def predict_car_prices(payload: Annotated[List[CarFeatures], Field(min_length=1, max_length=1000)]):
+    """
+    Predict prices for up to 1000 cars in a single model call.
+
+    Raises:
+        HTTPException: 503 if model is not loaded
+        HTTPException: 500 if prediction fails
+    """
+    if model is None:
+        logger.error("Batch prediction attempted but model is not loaded")
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded. Please check server logs and try again later."
+        )
+
+    try:
+        loop = asyncio.get_running_loop()
+        predictions = await loop.run_in_executor(executor, _predict_batch, payload)
+        logger.info(f"Batch prediction successful for {len(payload)} cars")
+        return {"predicted_prices_gbp": [round(float(p), 2) for p in predictions]}
+
+    except Exception as e:
+        logger.error(f"Batch prediction failed: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch prediction failed: {str(e)}"
+        )
+
 if __name__ == "__main__":
-    # This block allows you to run the app directly for testing
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # This block allows you to run the app directly for testing; one worker process per core
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=os.cpu_count(),
+                loop="uvloop", http="httptools")
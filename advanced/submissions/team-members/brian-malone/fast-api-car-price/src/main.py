@@ -1,26 +1,65 @@
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
 import joblib
+import numpy as np
 import pandas as pd
 import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Column order the pipeline was fitted on (model.feature_names_in_)
+FEATURE_COLUMNS = [
+    "Manufacturer", "Model", "Engine size", "Fuel type", "Year of manufacture",
+    "Mileage", "age", "mileage_per_year", "vintage",
+]
+
+# Reference year for the derived age features
+CURRENT_YEAR = 2025
+
+# Canonical car scored at startup: (manufacturer, model, fuel, engine, year, mileage)
+WARMUP_CAR = ("Toyota", "Corolla", "Petrol", 1.8, 2018, 50000.0)
 
 api = FastAPI(
     title="Car Price Prediction API",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson renders responses in C instead of the stdlib json module
+    default_response_class=ORJSONResponse,
 )
 
 model = None
+executor = None
 
 @api.on_event("startup")
 async def load_model():
-    global model
+    global model, executor
     model_path = os.getenv("MODEL_PATH", "/app/models/model.pkl")
     try:
         model = joblib.load(model_path)
+        fitted_columns = list(getattr(model, "feature_names_in_", FEATURE_COLUMNS))
+        if fitted_columns != FEATURE_COLUMNS:
+            raise ValueError(f"model expects columns {fitted_columns}")
+        _predict_cached.cache_clear()
         print(f"✓ Model loaded from {model_path}")
     except Exception as e:
         print(f"✗ Failed to load model: {e}")
         raise
+    # model.predict blocks, so keep it off the event loop
+    executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+    # Score a real row twice on the executor so the first request doesn't pay for lazy allocation
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    for _ in range(2):
+        await loop.run_in_executor(executor, _predict_cached.__wrapped__, *WARMUP_CAR)
+    print(f"✓ Model warm-up took {(time.perf_counter() - start) * 1000:.1f} ms")
+
+@api.on_event("shutdown")
+async def shutdown_executor():
+    if executor is not None:
+        executor.shutdown(wait=False)
 
 class CarFeatures(BaseModel):
     Manufacturer: str
@@ -30,36 +69,53 @@ class CarFeatures(BaseModel):
     Year_of_manufacture: int = Field(alias="Year of manufacture")
     Mileage: float
 
+    # Strip stray whitespace from the categorical fields during validation
+    model_config = ConfigDict(str_strip_whitespace=True)
+
 @api.get("/health")
 async def health_check():
     return {"status": "healthy", "model_loaded": model is not None}
 
+@lru_cache(maxsize=4096)
+def _predict_cached(manufacturer: str, model_name: str, fuel: str, engine: float,
+                    year: int, mileage: float) -> float:
+    age = max(CURRENT_YEAR - year, 0)
+    mileage_per_year = mileage / max(age, 1)
+    vintage = int(age >= 20)
+
+    row = np.array([(
+        manufacturer,
+        model_name,
+        engine,
+        fuel,
+        year,
+        mileage,
+        age,
+        mileage_per_year,
+        vintage,
+    )], dtype=object)
+    df = pd.DataFrame(row, columns=FEATURE_COLUMNS, copy=False)
+    return float(model.predict(df)[0])
+
 @api.post("/predict")
 async def predict(features: CarFeatures):
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     try:
-        CURRENT_YEAR = 2025
-        age = max(CURRENT_YEAR - features.Year_of_manufacture, 0)
-        mileage_per_year = features.Mileage / max(age, 1)
-        vintage = int(age >= 20)
-        
-        row = {
-            "Manufacturer": features.Manufacturer,
-            "Model": features.Model,
-            "Fuel type": features.Fuel_type,
-            "Engine size": features.Engine_size,
-            "Year of manufacture": features.Year_of_manufacture,
-            "Mileage": features.Mileage,
-            "age": age,
-            "mileage_per_year": mileage_per_year,
-            "vintage": vintage,
-        }
-        df = pd.DataFrame([row])
-        prediction = model.predict(df)[0]
+        loop = asyncio.get_running_loop()
+        prediction = await loop.run_in_executor(
+            executor,
+            _predict_cached,
+            features.Manufacturer,
+            features.Model,
+            features.Fuel_type,
+            features.Engine_size,
+            features.Year_of_manufacture,
+            features.Mileage,
+        )
         
-        return {"predicted_price_gbp": float(prediction)}
+        return {"predicted_price_gbp": prediction}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
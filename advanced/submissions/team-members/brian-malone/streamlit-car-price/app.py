@@ -1,7 +1,19 @@
 import streamlit as st
-import requests
+import httpx
+
+API_BASE_URL = "https://car-price-api-v1.onrender.com"
+
+
+# One pooled client per Streamlit server; keep-alive and HTTP/2 skip the TLS handshake on repeat clicks
+@st.cache_resource
+def get_client() -> httpx.Client:
+    return httpx.Client(
+        base_url=API_BASE_URL,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+        timeout=60,
+    )
 
-API_URL = "https://car-price-api-v1.onrender.com/predict"
 
 st.title("Car Price Predictor")
 
@@ -47,7 +59,7 @@ if st.button("Predict Price"):
     
     try:
         with st.spinner("Getting prediction..."):
-            response = requests.post(API_URL, json=payload, timeout=60)
+            response = get_client().post("/predict", json=payload)
             response.raise_for_status()
             
             result = response.json()
@@ -58,7 +70,7 @@ if st.button("Predict Price"):
             else:
                 st.error("No prediction returned")
                 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         st.error("Request timed out. API may be waking up - try again in 10 seconds.")
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         st.error(f"Error calling API: {str(e)}")
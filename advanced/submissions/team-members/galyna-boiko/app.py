@@ -1,19 +1,62 @@
-import pickle
 import joblib
+import numpy as np
 import pandas as pd
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+import logging
 import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from contextlib import asynccontextmanager
+import threading
 
 os.chdir(os.path.dirname(__file__))
 
-# Load the pretrained model
-model = joblib.load("model.pkl")
+# Column order the pipeline was fitted on (model.feature_names_in_)
+FEATURE_COLUMNS = [
+    "Manufacturer", "Model", "Engine size", "Fuel type", "Year of manufacture",
+    "Mileage", "age", "mileage_per_year", "vintage",
+]
 
-# Create FastAPI app
-app = FastAPI(title="Car Price Prediction API", version="1.0.0")
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pretrained model; loaded in lifespan() at startup rather than at import time
+MODEL_PATH = "model.pkl"
+model = None
+
+# Blocking inference runs here so the event loop stays free; created and shut down in lifespan()
+_EXECUTOR = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global model, _EXECUTOR
+    # Numpy arrays in the pickle are memory-mapped read-only, so workers share their pages
+    model = joblib.load(MODEL_PATH, mmap_mode="r")
+
+    # Rows are built positionally below, so fail fast if the model disagrees
+    if list(getattr(model, "feature_names_in_", FEATURE_COLUMNS)) != FEATURE_COLUMNS:
+        raise RuntimeError(f"model.pkl expects columns {list(model.feature_names_in_)}")
+    _predict_cached.cache_clear()
+
+    _EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+    # Score a real row twice on the executor so the first request doesn't pay for lazy allocation
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    for _ in range(2):
+        await loop.run_in_executor(_EXECUTOR, _predict_cached.__wrapped__, *WARMUP_CAR)
+    logger.info("Model warm-up took %.1f ms", (time.perf_counter() - start) * 1000)
+    yield
+    _EXECUTOR.shutdown(wait=False)
+
+# Create FastAPI app; orjson renders responses in C instead of the stdlib json module
+app = FastAPI(title="Car Price Prediction API", version="1.0.0", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 # --- Pydantic model for input ---
 class CarInput(BaseModel):
@@ -24,6 +67,9 @@ class CarInput(BaseModel):
     Year_of_manufacture: int = Field(..., alias="Year of manufacture", example=2019)
     Mileage: float = Field(..., example=45000)
 
+    # Whitespace is stripped once here rather than per field in the handler
+    model_config = ConfigDict(str_strip_whitespace=True)
+
 
 # --- Endpoints ---
 @app.get("/health")
@@ -44,48 +90,76 @@ def get_metadata():
     }
 
 
-@app.post("/predict")
-def predict_car_price(payload: CarInput):
-    payload_dict = payload.model_dump(by_alias=True)
+# Reference year for the derived age features
+CURRENT_YEAR = 2025
+
+# Canonical car scored at startup: (manufacturer, model, fuel, engine, year, mileage)
+WARMUP_CAR = ("Toyota", "Corolla", "Petrol", 1.8, 2018, 50000.0)
 
-    manufacturer = payload_dict["Manufacturer"].strip()
-    model_name = payload_dict["Model"].strip()
-    fuel = payload_dict["Fuel type"].strip()
-    engine = float(payload_dict["Engine size"])
-    year = int(payload_dict["Year of manufacture"])
-    mileage = float(payload_dict["Mileage"])
 
-    CURRENT_YEAR = 2025
+# One typed row per executor thread, overwritten in place for every prediction.
+# Strings stay object (category would reject makes the encoder has never seen) and
+# numbers stay float64/int64 so the scaler sees the same values as in training.
+_SCRATCH_DTYPES = {
+    "Manufacturer": object, "Model": object, "Engine size": np.float64, "Fuel type": object,
+    "Year of manufacture": np.int64, "Mileage": np.float64, "age": np.int64,
+    "mileage_per_year": np.float64, "vintage": np.int64,
+}
+_scratch = threading.local()
+
+
+def _scratch_frame() -> pd.DataFrame:
+    df = getattr(_scratch, "df", None)
+    if df is None:
+        df = pd.DataFrame({c: pd.Series([0], dtype=_SCRATCH_DTYPES[c]) for c in FEATURE_COLUMNS})
+        _scratch.df = df
+    return df
+
+
+@lru_cache(maxsize=4096)
+def _predict_cached(manufacturer: str, model_name: str, fuel: str, engine: float,
+                    year: int, mileage: float) -> float:
     age = max(CURRENT_YEAR - year, 0)
     mileage_per_year = mileage / max(age, 1)
     vintage = int(age >= 20)
 
-    row = {
-        "Manufacturer": manufacturer,
-        "Model": model_name,
-        "Fuel type": fuel,
-        "Engine size": engine,
-        "Year of manufacture": year,
-        "Mileage": mileage,
-        "age": age,
-        "mileage_per_year": mileage_per_year,
-        "vintage": vintage,
-    }
+    df = _scratch_frame()
+    for i, value in enumerate((manufacturer, model_name, engine, fuel, year, mileage,
+                               age, mileage_per_year, vintage)):
+        df.iat[0, i] = value
+    return float(model.predict(df)[0])
+
+
+@app.post("/predict")
+async def predict_car_price(payload: CarInput):
+    manufacturer = payload.Manufacturer
+    model_name = payload.Model
+    fuel = payload.Fuel_type
+    engine = payload.Engine_size
+    year = payload.Year_of_manufacture
+    mileage = payload.Mileage
+
+    loop = asyncio.get_running_loop()
+    prediction = await loop.run_in_executor(
+        _EXECUTOR, _predict_cached, manufacturer, model_name, fuel, engine, year, mileage
+    )
+
+    return {"predicted_price_gbp": prediction}
 
-    df = pd.DataFrame([row])
-    prediction = model.predict(df)[0]
 
-    return {"predicted_price_gbp": float(prediction)}
+# The landing page never changes while the server runs, so it is read from disk once
+@lru_cache(maxsize=1)
+def _index_html() -> bytes:
+    with open(os.path.join("templates", "index.html"), "rb") as f:
+        return f.read()
 
 
 @app.get("/", response_class=HTMLResponse)
 def read_root():
-    html_path = os.path.join("templates", "index.html")
-    with open(html_path, "r") as f:
-        html_content = f.read()
-    return HTMLResponse(content=html_content)
+    return HTMLResponse(content=_index_html())
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers need an import string; one process per core
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=os.cpu_count())
 
@@ -1,16 +1,79 @@
-import pickle
 import joblib
+import numpy as np
 import pandas as pd
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated
+import logging
 import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from contextlib import asynccontextmanager
+import threading
 
-# Load the pre-trained model
-model = joblib.load("models/model.pkl")
+# Column order the pipeline was fitted on (model.feature_names_in_)
+FEATURE_COLUMNS = [
+    "Manufacturer", "Model", "Engine size", "Fuel type", "Year of manufacture",
+    "Mileage", "age", "mileage_per_year", "vintage",
+]
 
-# Create FastAPI app
-app = FastAPI(title="Car Price Prediction API", version="1.0.0")
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pre-trained model; loaded in lifespan() at startup rather than at import time
+MODEL_PATH = "models/model.pkl"
+model = None
+
+# Blocking inference runs here so the event loop stays free; created and shut down in lifespan()
+_EXECUTOR = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global model, _EXECUTOR
+    # Numpy arrays in the pickle are memory-mapped read-only, so workers share their pages
+    model = joblib.load(MODEL_PATH, mmap_mode="r")
+
+    # Rows are built positionally below, so fail fast if the model disagrees
+    if list(getattr(model, "feature_names_in_", FEATURE_COLUMNS)) != FEATURE_COLUMNS:
+        raise RuntimeError(f"model.pkl expects columns {list(model.feature_names_in_)}")
+    _predict_cached.cache_clear()
+
+    _EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+    # Score a real row twice on the executor so the first request doesn't pay for lazy allocation
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    for _ in range(2):
+        await loop.run_in_executor(_EXECUTOR, _predict_cached.__wrapped__, *WARMUP_CAR)
+    logger.info("Model warm-up took %.1f ms", (time.perf_counter() - start) * 1000)
+    yield
+    _EXECUTOR.shutdown(wait=False)
+
+# Reference year for the derived age features, fixed at the year the model was trained
+CURRENT_YEAR = 2025
+
+# Newest accepted year of manufacture, from the UTC clock at startup
+MAX_YEAR = time.gmtime().tm_year
+
+# Request body for /predict; JSON keys match the training column names
+class CarFeatures(BaseModel):
+    Manufacturer: str
+    Model: str
+    Fuel_type: Annotated[str, Field(alias="Fuel type")]
+    Engine_size: Annotated[float, Field(alias="Engine size", gt=0)]
+    Year_of_manufacture: Annotated[int, Field(alias="Year of manufacture", ge=1980, le=MAX_YEAR)]
+    Mileage: Annotated[float, Field(ge=0)]
+
+    # Strip once during validation; bad or out-of-range input is a 422 before the handler runs
+    model_config = ConfigDict(str_strip_whitespace=True, str_to_lower=False)
+
+# Create FastAPI app; orjson renders responses in C instead of the stdlib json module
+app = FastAPI(title="Car Price Prediction API", version="1.0.0", lifespan=lifespan,
+              default_response_class=ORJSONResponse)
 
 # Health check endpoint
 @app.get("/health")
@@ -30,54 +93,80 @@ def get_metadata():
         ]
     }
 
-# Prediction endpoint
-@app.post("/predict")
-def predict_car_price(payload_dict: dict):
-    # Extract features from input dictionary
-    manufacturer = str(payload_dict["Manufacturer"]).strip()
-    model_name = str(payload_dict["Model"]).strip()
-    fuel = str(payload_dict["Fuel type"]).strip()
-    engine = float(payload_dict["Engine size"])
-    year = int(payload_dict["Year of manufacture"])
-    mileage = float(payload_dict["Mileage"])
+# Canonical car scored at startup: (manufacturer, model, fuel, engine, year, mileage)
+WARMUP_CAR = ("Toyota", "Corolla", "Petrol", 1.8, 2018, 50000.0)
+
+# One typed row per executor thread, overwritten in place for every prediction.
+# Strings stay object (category would reject makes the encoder has never seen) and
+# numbers stay float64/int64 so the scaler sees the same values as in training.
+_SCRATCH_DTYPES = {
+    "Manufacturer": object, "Model": object, "Engine size": np.float64, "Fuel type": object,
+    "Year of manufacture": np.int64, "Mileage": np.float64, "age": np.int64,
+    "mileage_per_year": np.float64, "vintage": np.int64,
+}
+_scratch = threading.local()
+
+
+def _scratch_frame() -> pd.DataFrame:
+    df = getattr(_scratch, "df", None)
+    if df is None:
+        df = pd.DataFrame({c: pd.Series([0], dtype=_SCRATCH_DTYPES[c]) for c in FEATURE_COLUMNS})
+        _scratch.df = df
+    return df
 
+# Cached prediction for one car, keyed on the cleaned inputs
+@lru_cache(maxsize=4096)
+def _predict_cached(manufacturer: str, model_name: str, fuel: str, engine: float,
+                    year: int, mileage: float) -> float:
     # Derived features (training pipeline expected these)
-    CURRENT_YEAR = 2025
     age = max(CURRENT_YEAR - year, 0)
     mileage_per_year = mileage / max(age, 1)
     vintage = int(age >= 20)
-    
-    # Create single-row dataframe with ALL columns needed
-    row = {
-        "Manufacturer": manufacturer,
-        "Model": model_name,
-        "Fuel type": fuel,
-        "Engine size": engine,
-        "Year of manufacture": year,
-        "Mileage": mileage,
-        # derived:
-        "age": age,
-        "mileage_per_year": mileage_per_year,
-        "vintage": vintage,
-    }
-    df = pd.DataFrame([row])
-    
+
+    # Fill this thread's scratch row with ALL columns needed, in FEATURE_COLUMNS order
+    df = _scratch_frame()
+    for i, value in enumerate((manufacturer, model_name, engine, fuel, year, mileage,
+                               # derived:
+                               age, mileage_per_year, vintage)):
+        df.iat[0, i] = value
+
     # Make prediction
-    prediction = model.predict(df)[0]
-    
+    return float(model.predict(df)[0])
+
+# Prediction endpoint
+@app.post("/predict")
+async def predict_car_price(payload: CarFeatures):
+    # Extract the validated features
+    manufacturer = payload.Manufacturer
+    model_name = payload.Model
+    fuel = payload.Fuel_type
+    engine = payload.Engine_size
+    year = payload.Year_of_manufacture
+    mileage = payload.Mileage
+
+    loop = asyncio.get_running_loop()
+    prediction = await loop.run_in_executor(
+        _EXECUTOR, _predict_cached, manufacturer, model_name, fuel, engine, year, mileage
+    )
+
     # Return prediction
     return {
-        "predicted_price_gbp": round(float(prediction),2)
+        "predicted_price_gbp": round(prediction, 2)
     }
 
+# The landing page never changes while the server runs, so it is read from disk once
+@lru_cache(maxsize=1)
+def _index_html() -> bytes:
+    with open(os.path.join("templates", "index.html"), "rb") as f:
+        return f.read()
+
 # Root endpoint
 @app.get("/", response_class=HTMLResponse)
 def read_root():
-    html_path = os.path.join("templates", "index.html")
-    with open(html_path, "r") as f:
-        html_content = f.read()
-    return HTMLResponse(content=html_content)
+    return HTMLResponse(content=_index_html())
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers need an import string; one process per core
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=os.cpu_count(),
+                loop="uvloop", http="httptools")
@@ -0,0 +1,116 @@
+"""
+Export the fitted sklearn/XGBoost pipeline (model.pkl) to ONNX (model.onnx).
+
+main.py serves model.onnx through onnxruntime when it sits next to the model
+and falls back to the pickled pipeline otherwise. Run this once after training:
+
+    pip install skl2onnx onnxmltools onnxruntime
+    python export_onnx.py [path/to/model.pkl]
+"""
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+from onnx import TensorProto, helper
+from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+from skl2onnx import convert_sklearn, update_registered_converter
+from skl2onnx.common.data_types import DoubleTensorType, Int64TensorType, StringTensorType
+from skl2onnx.common.shape_calculator import calculate_linear_regressor_output_shapes
+from xgboost import XGBRegressor
+
+from main import FEATURE_COLUMNS, MODEL_PATH
+
+# Input types per column; everything else is numeric and exported as double so
+# the StandardScaler step matches sklearn's float64 arithmetic bit for bit
+INPUT_TYPES = {
+    "Manufacturer": StringTensorType([None, 1]),
+    "Model": StringTensorType([None, 1]),
+    "Fuel type": StringTensorType([None, 1]),
+    "Year of manufacture": Int64TensorType([None, 1]),
+    "vintage": Int64TensorType([None, 1]),
+}
+
+update_registered_converter(
+    XGBRegressor, "XGBoostXGBRegressor",
+    calculate_linear_regressor_output_shapes, convert_xgboost,
+)
+
+
+def patch_tree_input(onnx_model):
+    """
+    Make the tree ensemble see its input the way XGBoost did during training.
+
+    The ColumnTransformer emits a sparse matrix, and XGBoost treats entries
+    missing from a sparse matrix as NaN, not 0. ONNX densifies that matrix, so
+    cast to float32 (as XGBoost does) and map exact zeros back to NaN.
+    """
+    graph = onnx_model.graph
+    tree = next(n for n in graph.node if n.op_type == "TreeEnsembleRegressor")
+    index = list(graph.node).index(tree)
+    graph.initializer.extend([
+        helper.make_tensor("tree_zero", TensorProto.FLOAT, [], [0.0]),
+        helper.make_tensor("tree_missing", TensorProto.FLOAT, [], [float("nan")]),
+    ])
+    for offset, node in enumerate([
+        helper.make_node("Cast", [tree.input[0]], ["tree_x32"], to=TensorProto.FLOAT),
+        helper.make_node("Equal", ["tree_x32", "tree_zero"], ["tree_is_zero"]),
+        helper.make_node("Where", ["tree_is_zero", "tree_missing", "tree_x32"], ["tree_x"]),
+    ]):
+        graph.node.insert(index + offset, node)
+    tree.input[0] = "tree_x"
+    for output in graph.output:
+        output.type.tensor_type.elem_type = TensorProto.FLOAT
+    return onnx_model
+
+
+def sample_frame(pipeline, n=500, seed=0):
+    """Random rows over the encoder's categories (plus one unknown) for a parity check."""
+    rng = np.random.default_rng(seed)
+    categories = pipeline.named_steps["preprocessor"].named_transformers_["cat"].categories_
+    rows = []
+    for _ in range(n):
+        year = int(rng.integers(1980, 2026))
+        mileage = float(rng.integers(0, 300_000))
+        age = max(2025 - year, 0)
+        rows.append((
+            rng.choice([*categories[0], "Unknown"]), rng.choice(categories[1]),
+            float(rng.choice([1.0, 1.4, 2.0, 3.0])), rng.choice(categories[2]),
+            year, mileage, age, mileage / max(age, 1), int(age >= 20),
+        ))
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+
+def main():
+    model_path = Path(sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH)
+    pipeline = joblib.load(model_path)
+
+    initial_types = [(col, INPUT_TYPES.get(col, DoubleTensorType([None, 1]))) for col in FEATURE_COLUMNS]
+    onnx_model = patch_tree_input(convert_sklearn(
+        pipeline, initial_types=initial_types, target_opset={"": 17, "ai.onnx.ml": 3},
+    ))
+
+    # Refuse to write a model that disagrees with the pickled pipeline
+    df = sample_frame(pipeline)
+    session = ort.InferenceSession(onnx_model.SerializeToString(), providers=["CPUExecutionProvider"])
+    by_name = {col.replace(" ", "_"): col for col in FEATURE_COLUMNS}
+    dtypes = {"tensor(string)": object, "tensor(int64)": np.int64, "tensor(double)": np.float64}
+    feed = {
+        i.name: df[by_name[i.name]].to_numpy().astype(dtypes[i.type]).reshape(-1, 1)
+        for i in session.get_inputs()
+    }
+    expected = pipeline.predict(df)
+    actual = session.run(None, feed)[0].ravel()
+    worst = float(np.max(np.abs(actual - expected) / np.abs(expected)))
+    if worst > 1e-4:
+        raise SystemExit(f"ONNX export does not match the pipeline (max relative error {worst:.2e})")
+
+    onnx_path = model_path.with_suffix(".onnx")
+    onnx_path.write_bytes(onnx_model.SerializeToString())
+    print(f"Wrote {onnx_path} (max relative error vs pipeline {worst:.2e})")
+
+
+if __name__ == "__main__":
+    main()
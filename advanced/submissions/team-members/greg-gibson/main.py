@@ -1,55 +1,478 @@
+# The model-serving core here (model loading, the fast path and ONNX scoring, the derived-feature
+# kernel, the prediction cache, micro-batching and lifespan) matches ../patrick-githendu/patrick.py and
+# ../jackiecwv/main.py; each submission keeps its own copy so it builds and ships on its own.
+# Only the request schema, the routes and the response body differ between them.
+
+import asyncio
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+from functools import lru_cache
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated
 import joblib
+import numpy as np
 import pandas as pd
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional: the pickled pipeline is served instead
+    ort = None
+
+try:
+    from numba import njit
+except ImportError:  # optional: derived features fall back to plain numpy
+    njit = None
+
+try:
+    import skops.io as sio
+except ImportError:  # optional: model.pkl is unpickled with joblib instead
+    sio = None
+
+# Reference year for the derived age features (UTC); refreshed daily, see _refresh_current_year()
+@lru_cache(maxsize=1)
+def _current_year() -> int:
+    return time.gmtime().tm_year
+
+CURRENT_YEAR = _current_year()
+
+# Column order the pipeline was fitted on (model.feature_names_in_)
+FEATURE_COLUMNS = [
+    "Manufacturer", "Model", "Engine size", "Fuel type", "Year of manufacture",
+    "Mileage", "age", "mileage_per_year", "vintage",
+]
+
+# The pre-trained model, loaded at startup rather than on import
+MODEL_PATH = 'models/model.pkl'
+model = None
+
+# Pipeline preprocessing precomputed for the booster, see build_fast_path()
+fast_path = None  # (estimator, n_features, numeric specs, cat_index)
 
-# Load the pre-trained model
-model = joblib.load('models/model.pkl')
+# ONNX Runtime session for model.onnx, if one was exported; see load_onnx_session()
+onnx_session = None
+onnx_inputs = []  # (input name, FEATURE_COLUMNS position, dtype)
 
-app = FastAPI()
+# Encoder categories, see known_categories()
+_KNOWN_CATEGORIES = {}
+
+# Startup messages; uvicorn only configures its own loggers
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _EXECUTOR, _batch_queue, _batch_worker_task, _year_refresh_task
+    load_model()
+    if PREDICT_PROCESSES > 0:
+        # Only the six input scalars per row cross the process boundary
+        _EXECUTOR = ProcessPoolExecutor(max_workers=PREDICT_PROCESSES, initializer=load_model)
+    else:
+        # XGBoost and NumPy release the GIL while scoring, so threads run in parallel
+        _EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+    _batch_queue = asyncio.Queue()
+    _batch_worker_task = asyncio.create_task(_batch_worker())
+    _year_refresh_task = asyncio.create_task(_refresh_current_year())
+
+    # Score a single row and a full batch on the executor, bypassing the cache, so the
+    # first requests don't pay for lazy imports and first-call allocation
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    for rows in ([WARMUP_CAR], [WARMUP_CAR], [WARMUP_CAR] * MAX_BATCH):
+        await loop.run_in_executor(_EXECUTOR, _predict_rows, rows, CURRENT_YEAR)
+    logger.info("Model warm-up took %.1f ms", (time.perf_counter() - start) * 1000)
+    yield
+
+    # Stop the background tasks before the executor they submit to
+    _batch_worker_task.cancel()
+    _year_refresh_task.cancel()
+    await asyncio.gather(_batch_worker_task, _year_refresh_task, return_exceptions=True)
+    _EXECUTOR.shutdown(wait=False)
+
+# orjson encodes the response dicts straight to bytes
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Define a health check endpoint
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
-# Define a prediction endpoint
-@app.post("/predict")
-def predict_car_price(payload_dict: dict):
-    # Extract features from input dictionary
-    manufacturer = str(payload_dict["Manufacturer"]).strip()
-    model_name = str(payload_dict["Model"]).strip()
-    fuel = str(payload_dict["Fuel type"]).strip()
-    engine = float(payload_dict["Engine size"])
-    year = int(payload_dict["Year of manufacture"])
-    mileage = float(payload_dict["Mileage"])
-    
+# Expose prediction cache hit/miss counters
+@app.get("/metadata")
+def metadata():
+    return {"prediction_cache": _cache_info()}
+
+# Derived features for a batch: age, mileage_per_year and vintage, in float64 like the Python expressions
+def _derive_numpy(years, mileages, current_year):
+    age = np.maximum(current_year - years, 0)
+    return age, mileages / np.maximum(age, 1), (age >= 20).astype(np.int64)
+
+if njit is not None:
+    # Explicit signature compiles at import; no fastmath, so the division matches Python bit for bit
+    @njit("Tuple((int64[:], float64[:], int64[:]))(int64[:], float64[:], int64)", cache=True)
+    def _derive(years, mileages, current_year):
+        n = years.shape[0]
+        age = np.empty(n, dtype=np.int64)
+        mileage_per_year = np.empty(n, dtype=np.float64)
+        vintage = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            a = max(current_year - years[i], 0)
+            age[i] = a
+            mileage_per_year[i] = mileages[i] / max(a, 1)
+            vintage[i] = 1 if a >= 20 else 0
+        return age, mileage_per_year, vintage
+else:
+    _derive = _derive_numpy
+
+# Set USE_PKL=1 to load and score the pickled pipeline even when a model.skops or model.onnx is present,
+# e.g. to check the ONNX export against it
+USE_PKL = os.getenv("USE_PKL") == "1"
+
+# Set FAST_PATH=0 to score through the full sklearn pipeline instead of the precomputed encoder
+FAST_PATH = os.getenv("FAST_PATH", "1") != "0"
+
+# Types a model.skops may hold beyond skops' built-in sklearn/numpy allowlist
+SKOPS_TRUSTED = ["xgboost.core.Booster", "xgboost.sklearn.XGBRegressor"]
+
+def load_pipeline(model_path):
+    """
+    Load the fitted pipeline, preferring a model.skops that sits next to the pickle.
+
+    skops rebuilds the pipeline from an allowlist of types instead of running
+    arbitrary pickle code. Convert the pickle once with
+    python -c "import joblib, skops.io; skops.io.dump(joblib.load('model.pkl'), 'model.skops')"
+    """
+    skops_path = os.path.splitext(model_path)[0] + ".skops"
+    if sio is None or USE_PKL or not os.path.exists(skops_path):
+        # mmap_mode="r" maps the pickle's numpy arrays read-only instead of copying them
+        return joblib.load(model_path, mmap_mode="r")
+    untrusted = [t for t in sio.get_untrusted_types(file=skops_path) if t not in SKOPS_TRUSTED]
+    if untrusted:
+        raise RuntimeError(f"{skops_path} holds types outside SKOPS_TRUSTED: {untrusted}")
+    return sio.load(skops_path, trusted=SKOPS_TRUSTED)
+
+def load_onnx_session(model_path):
+    """
+    Open the ONNX export that sits next to the pickle; (None, []) if there isn't one.
+
+    Export it with python export_onnx.py [path/to/model.pkl] from this directory, which
+    refuses to write a graph whose predictions drift from the pipeline.
+    """
+    onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+    if ort is None or USE_PKL or not os.path.exists(onnx_path):
+        return None, []
+    options = ort.SessionOptions()
+    # Micro-batching and workers provide the parallelism; keep each run on one thread
+    options.intra_op_num_threads = 1
+    session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+    # skl2onnx names inputs after the columns, with spaces replaced by underscores
+    column_index = {col.replace(" ", "_"): i for i, col in enumerate(FEATURE_COLUMNS)}
+    dtypes = {"tensor(string)": object, "tensor(int64)": np.int64, "tensor(double)": np.float64}
+    inputs = [(i.name, column_index[i.name], dtypes[i.type]) for i in session.get_inputs()]
+    return session, inputs
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def known_categories(pipeline) -> dict:
+    """Interned encoder categories mapped to themselves, so requests can reuse one object per value."""
+    preprocessor = getattr(pipeline, "named_steps", {}).get("preprocessor")
+    known = {}
+    for _, transformer, _ in getattr(preprocessor, "transformers_", []):
+        for categories in getattr(transformer, "categories_", []):
+            known.update((_intern(cat), _intern(cat)) for cat in categories.tolist() if isinstance(cat, str))
+    return known
+
+def build_fast_path(pipeline):
+    """
+    Precompute the ColumnTransformer so rows can be encoded for the booster without pandas.
+
+    Returns None unless the preprocessor is exactly a StandardScaler plus a
+    OneHotEncoder(handle_unknown="ignore") with sparse output, in which case the
+    full pipeline is used. encode_rows marks zeros as missing, which only matches
+    what the booster saw in training when the ColumnTransformer output was sparse.
+    """
+    preprocessor = pipeline.named_steps.get("preprocessor")
+    estimator = pipeline.named_steps.get("model")
+    if preprocessor is None or estimator is None or not hasattr(preprocessor, "output_indices_"):
+        return None
+    if not getattr(preprocessor, "sparse_output_", False):
+        return None
+
+    numeric, cat_index = [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        start = preprocessor.output_indices_[name].start
+        positions = [FEATURE_COLUMNS.index(col) for col in columns]
+        if isinstance(transformer, StandardScaler) and transformer.with_mean and transformer.with_std:
+            numeric += [
+                (pos, start + j, float(transformer.mean_[j]), float(transformer.scale_[j]))
+                for j, pos in enumerate(positions)
+            ]
+        elif isinstance(transformer, OneHotEncoder) and transformer.handle_unknown == "ignore" \
+                and transformer.drop is None and getattr(transformer, "infrequent_categories_", None) is None:
+            for pos, categories in zip(positions, transformer.categories_):
+                cat_index.append((pos, {_intern(cat): start + k for k, cat in enumerate(categories.tolist())}))
+                start += len(categories)
+        else:
+            return None
+
+    n_features = max(sl.stop for sl in preprocessor.output_indices_.values())
+    return estimator, n_features, numeric, cat_index
+
+def encode_rows(values, n_features, numeric, cat_index) -> np.ndarray:
+    """Encode per-column sequences (in FEATURE_COLUMNS order) exactly as the preprocessor would."""
+    n = len(values[0])
+    x = np.zeros((n, n_features))
+    # Scale in float64 like StandardScaler; the tree thresholds sit on these values cast to float32
+    for pos, col, mean, scale in numeric:
+        x[:, col] = (np.asarray(values[pos], dtype=np.float64) - mean) / scale
+    # Unknown categories leave their block all zeros, as handle_unknown="ignore" does
+    for pos, index in cat_index:
+        cols = np.fromiter((index.get(v, -1) for v in values[pos]), dtype=np.intp, count=n)
+        known = np.flatnonzero(cols >= 0)
+        x[known, cols[known]] = 1.0
+    x = x.astype(np.float32)
+    # The booster was fitted on the sparse encoder output, where absent entries are missing, not 0
+    x[x == 0] = np.nan
+    return x
+
+# Cars scored both ways before the fast path is trusted: (manufacturer, model, fuel, engine, year, mileage).
+# The last one has categories the encoder has never seen.
+_PARITY_CARS = [
+    ("Toyota", "Corolla", "Petrol", 1.8, 2018, 50000.0),
+    ("BMW", "X3", "Diesel", 2.0, 2015, 60000.0),
+    ("Ford", "Focus", "Diesel", 1.5, 1999, 123000.0),
+    ("Porsche", "911", "Hybrid", 3.0, 2025, 0.0),
+    ("Unknown", "Unknown", "Unknown", 1.0, 1980, 300000.0),
+]
+
+def fast_path_matches(pipeline, fast_path) -> bool:
+    """Score _PARITY_CARS through the fast path and through pipeline.predict; True if they agree."""
+    manufacturers, model_names, fuels, engines, years, mileages = zip(*_PARITY_CARS)
+    age, mileage_per_year, vintage = _derive(
+        np.array(years, dtype=np.int64), np.array(mileages, dtype=np.float64), CURRENT_YEAR
+    )
+    values = (manufacturers, model_names, engines, fuels, years, mileages, age, mileage_per_year, vintage)
+    estimator, n_features, numeric, cat_index = fast_path
+    fast = estimator.predict(encode_rows(values, n_features, numeric, cat_index))
+    full = pipeline.predict(pd.DataFrame(dict(zip(FEATURE_COLUMNS, values))))
+    return bool(np.allclose(fast, full, rtol=1e-6))
+
+# Concurrent /predict calls are queued and scored together, up to MAX_BATCH rows per model call
+MAX_BATCH = 32
+MAX_DELAY_MS = 5
+
+# Canonical car scored at startup: (manufacturer, model, fuel, engine, year, mileage)
+WARMUP_CAR = ("Toyota", "Corolla", "Petrol", 1.8, 2018, 50000.0)
+
+# Queue of (inputs, future), and how many model calls are running; only touched on the event loop
+_batch_queue = None
+_in_flight = 0
+
+# Recent predictions keyed on (inputs, reference year), most recently used last. Looked up on
+# the event loop before a request is scored or queued, so batched results are cached too.
+PREDICTION_CACHE_SIZE = 4096
+_prediction_cache = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0}
+
+# Set PREDICT_PROCESSES=N to score in N child processes, each loading its own model,
+# instead of the default thread pool. Children only score rows; the prediction cache and its
+# /metadata counters stay in this process, so they cover every request in either mode.
+PREDICT_PROCESSES = int(os.getenv("PREDICT_PROCESSES", "0"))
+
+# Executor for blocking inference, created in lifespan()
+_EXECUTOR = None
+
+# Background tasks started in lifespan(), kept so shutdown can cancel them
+_batch_worker_task = None
+_year_refresh_task = None
+
+# Each executor thread fills its own preallocated object buffer, so frames are built without copies
+_scratch = threading.local()
+
+def _scratch_rows(n: int) -> np.ndarray:
+    buffer = getattr(_scratch, "buffer", None)
+    # Sized for a full micro-batch; a larger _predict_rows call grows it to fit
+    if buffer is None or len(buffer) < n:
+        buffer = _scratch.buffer = np.empty((max(n, MAX_BATCH), len(FEATURE_COLUMNS)), dtype=object)
+    return buffer[:n]
+
+# A lone row instead overwrites a typed one-row frame, also per thread. Strings stay object
+# (category would reject unseen makes) and numbers keep the dtypes the scaler was fitted on.
+_SCRATCH_DTYPES = {
+    "Manufacturer": object, "Model": object, "Engine size": np.float64, "Fuel type": object,
+    "Year of manufacture": np.int64, "Mileage": np.float64, "age": np.int64,
+    "mileage_per_year": np.float64, "vintage": np.int64,
+}
+
+def _scratch_frame() -> pd.DataFrame:
+    df = getattr(_scratch, "df", None)
+    if df is None:
+        df = _scratch.df = pd.DataFrame({c: pd.Series([0], dtype=_SCRATCH_DTYPES[c]) for c in FEATURE_COLUMNS})
+    return df
+
+def _predict_rows(rows, current_year: int) -> list:
+    manufacturers, model_names, fuels, engines, years, mileages = zip(*rows)
     # Derived features (training pipeline expected these)
-    CURRENT_YEAR = 2025
-    age = max(CURRENT_YEAR - year, 0)
-    mileage_per_year = mileage / max(age, 1)
-    vintage = int(age >= 20)
-
-    # Create single-row dataframe with ALL columns needed
-    row = {
-        "Manufacturer": manufacturer,
-        "Model": model_name,
-        "Fuel type": fuel,
-        "Engine size": engine,
-        "Year of manufacture": year,
-        "Mileage": mileage,
-        # derived:
-        "age": age,
-        "mileage_per_year": mileage_per_year,
-        "vintage": vintage,
-    }
-    df = pd.DataFrame([row])
+    age, mileage_per_year, vintage = _derive(
+        np.array(years, dtype=np.int64), np.array(mileages, dtype=np.float64), current_year
+    )
+
+    # ALL columns needed, in FEATURE_COLUMNS order
+    values = (manufacturers, model_names, engines, fuels, years, mileages,
+              # derived:
+              age, mileage_per_year, vintage)
+    if onnx_session is not None:
+        feed = {name: np.asarray(values[i], dtype=dtype).reshape(-1, 1) for name, i, dtype in onnx_inputs}
+        return onnx_session.run(None, feed)[0].ravel().tolist()
+    if fast_path is not None:
+        estimator, n_features, numeric, cat_index = fast_path
+        return estimator.predict(encode_rows(values, n_features, numeric, cat_index)).tolist()
+
+    # Otherwise fill the dataframe the full pipeline expects
+    if len(rows) == 1:
+        df = _scratch_frame()
+        for col, column in enumerate(values):
+            df.iat[0, col] = column[0]
+    else:
+        features = _scratch_rows(len(rows))
+        for col, column in enumerate(values):
+            features[:, col] = column
+        df = pd.DataFrame(features, columns=FEATURE_COLUMNS, copy=False)
 
     # Make a prediction using the pre-trained model
-    prediction = model.predict(df)[0]
-    
-    # Return the prediction as a JSON response
+    return model.predict(df).tolist()
+
+def _cache_info() -> dict:
+    """Prediction cache counters, in the shape functools' cache_info() reports them."""
+    return {**_cache_stats, "maxsize": PREDICTION_CACHE_SIZE, "currsize": len(_prediction_cache)}
+
+async def _predict(row) -> float:
+    """Price one row: from the cache, straight away when idle, or in the next batch when busy."""
+    global _in_flight
+    key = (row, CURRENT_YEAR)
+    prediction = _prediction_cache.get(key)
+    if prediction is not None:
+        _prediction_cache.move_to_end(key)
+        _cache_stats["hits"] += 1
+        return prediction
+    _cache_stats["misses"] += 1
+
+    loop = asyncio.get_running_loop()
+    if _in_flight == 0 and _batch_queue.empty():
+        # Idle: score this request straight away
+        _in_flight += 1
+        try:
+            prediction = (await loop.run_in_executor(_EXECUTOR, _predict_rows, [row], CURRENT_YEAR))[0]
+        finally:
+            _in_flight -= 1
+    else:
+        # Busy: wait for the next batch
+        future = loop.create_future()
+        _batch_queue.put_nowait((row, future))
+        prediction = await future
+
+    _prediction_cache[key] = prediction
+    if len(_prediction_cache) > PREDICTION_CACHE_SIZE:
+        _prediction_cache.popitem(last=False)
+    return prediction
+
+def _drain_queue(batch: list) -> None:
+    while len(batch) < MAX_BATCH and not _batch_queue.empty():
+        batch.append(_batch_queue.get_nowait())
+
+async def _batch_worker():
+    global _in_flight
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _batch_queue.get()]
+        _drain_queue(batch)
+        # A lone request is scored at once; only concurrent arrivals wait for more company
+        if 1 < len(batch) < MAX_BATCH:
+            await asyncio.sleep(MAX_DELAY_MS / 1000)
+            _drain_queue(batch)
+
+        _in_flight += 1
+        try:
+            prices = await loop.run_in_executor(_EXECUTOR, _predict_rows, [row for row, _ in batch], CURRENT_YEAR)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), price in zip(batch, prices):
+                if not future.done():
+                    future.set_result(price)
+        finally:
+            _in_flight -= 1
+
+def load_model():
+    global model, fast_path, onnx_session, onnx_inputs, _KNOWN_CATEGORIES
+    model = load_pipeline(MODEL_PATH)
+
+    # Rows are built positionally, so fail fast if the model disagrees
+    if list(getattr(model, "feature_names_in_", FEATURE_COLUMNS)) != FEATURE_COLUMNS:
+        raise RuntimeError(f"model.pkl expects columns {list(model.feature_names_in_)}")
+    fast_path = build_fast_path(model) if FAST_PATH else None
+    if fast_path is not None and not fast_path_matches(model, fast_path):
+        logger.warning("Fast path disagrees with the pipeline; scoring through the full pipeline")
+        fast_path = None
+    onnx_session, onnx_inputs = load_onnx_session(MODEL_PATH)
+    _KNOWN_CATEGORIES = known_categories(model)
+    _prediction_cache.clear()
+    _cache_stats.update(hits=0, misses=0)
+
+async def _refresh_current_year():
+    global CURRENT_YEAR
+    while True:
+        # Wake just after the next UTC midnight; rows pick up the new year from then on
+        await asyncio.sleep(86400 - time.time() % 86400 + 1)
+        _current_year.cache_clear()
+        CURRENT_YEAR = _current_year()
+
+# Request body for /predict; JSON keys match the training column names
+class CarFeatures(BaseModel):
+    Manufacturer: str
+    Model: str
+    Fuel_type: Annotated[str, Field(alias="Fuel type")]
+    Engine_size: Annotated[float, Field(alias="Engine size")]
+    Year_of_manufacture: Annotated[int, Field(alias="Year of manufacture")]
+    Mileage: float
+
+    # Strip and coerce once during validation instead of in the handler
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+# Define a prediction endpoint
+@app.post("/predict")
+async def predict_car_price(payload: CarFeatures):
+    # Swap known values for the model's interned category strings
+    manufacturer = _KNOWN_CATEGORIES.get(payload.Manufacturer, payload.Manufacturer)
+    model_name = _KNOWN_CATEGORIES.get(payload.Model, payload.Model)
+    fuel = _KNOWN_CATEGORIES.get(payload.Fuel_type, payload.Fuel_type)
+    row = (manufacturer, model_name, fuel, payload.Engine_size, payload.Year_of_manufacture, payload.Mileage)
+
+    prediction = await _predict(row)
+
+    # Return the prediction as a JSON response, rounded half up to whole pence;
+    # floor rather than int() so negative predictions round the same way
     return {
-        # "input_features": row,
-        "predicted_price": round(float(prediction), 2)
+        "predicted_price": math.floor(prediction * 100 + 0.5) / 100
     }
 
+
+if __name__ == "__main__":
+    import uvicorn
+    # Workers need an import string; one process per core
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=os.cpu_count(),
+                loop="uvloop", http="httptools", access_log=False)